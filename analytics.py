@@ -0,0 +1,164 @@
+# analytics.py
+import pandas as pd
+import streamlit as st
+from patient_history import get_connection
+
+# Rows newer than now() - lag are left for the next refresh, so a save whose
+# transaction started before the refresh but committed after it is not skipped.
+REFRESH_LAG = "1 minute"
+SUMMARY_NAME = "patient_record_daily_summary"
+
+# 🏗️ Summary + high-water-mark tables (run once during app startup)
+def init_analytics_tables():
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS patient_record_daily_summary (
+            day DATE NOT NULL,
+            disease VARCHAR(50) NOT NULL,
+            diagnosis_result VARCHAR(50) NOT NULL,
+            gender VARCHAR(10) NOT NULL,
+            age_band VARCHAR(10) NOT NULL,
+            user_id INTEGER NOT NULL,
+            record_count INTEGER NOT NULL,
+            confidence_sum DOUBLE PRECISION NOT NULL,
+            PRIMARY KEY (day, disease, diagnosis_result, gender, age_band, user_id)
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS analytics_refresh_state (
+            name VARCHAR(50) PRIMARY KEY,
+            high_water_mark TIMESTAMP NOT NULL
+        )
+    """)
+    cur.execute("""
+        INSERT INTO analytics_refresh_state (name, high_water_mark)
+        VALUES (%s, '-infinity')
+        ON CONFLICT (name) DO NOTHING
+    """, (SUMMARY_NAME,))
+    conn.commit()
+    cur.close()
+    conn.close()
+
+# 🔄 Fold records created since the last refresh into the summary, returns rows folded in
+def refresh_summary():
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        # Row lock serializes concurrent refreshes so no window is counted twice
+        cur.execute("""
+            SELECT high_water_mark, LOCALTIMESTAMP - %s::interval
+            FROM analytics_refresh_state
+            WHERE name = %s
+            FOR UPDATE
+        """, (REFRESH_LAG, SUMMARY_NAME))
+        old_mark, new_mark = cur.fetchone()
+        if new_mark <= old_mark:
+            conn.rollback()
+            return 0
+
+        cur.execute("""
+            INSERT INTO patient_record_daily_summary AS s (
+                day, disease, diagnosis_result, gender, age_band, user_id, record_count, confidence_sum
+            )
+            SELECT
+                created_at::date,
+                COALESCE(disease, 'Unknown'),
+                COALESCE(diagnosis_result, 'Unknown'),
+                COALESCE(lower(gender), 'unknown'),
+                CASE
+                    WHEN age IS NULL THEN 'Unknown'
+                    WHEN age < 30 THEN '<30'
+                    WHEN age < 45 THEN '30-44'
+                    WHEN age < 60 THEN '45-59'
+                    ELSE '60+'
+                END,
+                COALESCE(user_id, 0),
+                COUNT(*),
+                COALESCE(SUM(confidence_score), 0)
+            FROM patient_records
+            WHERE created_at > %s AND created_at <= %s
+            GROUP BY 1, 2, 3, 4, 5, 6
+            ON CONFLICT (day, disease, diagnosis_result, gender, age_band, user_id) DO UPDATE SET
+                record_count = s.record_count + EXCLUDED.record_count,
+                confidence_sum = s.confidence_sum + EXCLUDED.confidence_sum
+        """, (old_mark, new_mark))
+        folded = cur.rowcount
+        cur.execute("""
+            UPDATE analytics_refresh_state SET high_water_mark = %s WHERE name = %s
+        """, (new_mark, SUMMARY_NAME))
+        conn.commit()
+        return folded
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+# 📊 Pre-aggregated rows for the dashboard, joined with clinician names
+@st.cache_data(ttl=60, show_spinner=False)
+def load_summary(days=90):
+    refresh_summary()
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT s.day, s.disease, s.diagnosis_result, s.gender, s.age_band,
+               COALESCE(u.name, 'Unknown') AS clinician, s.record_count, s.confidence_sum
+        FROM patient_record_daily_summary s
+        LEFT JOIN users u ON u.id = s.user_id
+        WHERE s.day >= CURRENT_DATE - %s
+    """, (days,))
+    rows = cur.fetchall()
+    cur.close()
+    conn.close()
+    return pd.DataFrame(rows, columns=[
+        "day", "disease", "diagnosis_result", "gender", "age_band",
+        "clinician", "record_count", "confidence_sum"
+    ])
+
+# 📈 Analytics view inside Streamlit
+def display_analytics():
+    st.subheader("📊 Cohort Analytics")
+    if st.button("⬅️ Back to Mode Selection", key="analytics_back"):
+        st.session_state.mode = None
+        st.rerun()
+
+    days = st.selectbox("Period", [7, 30, 90, 365], index=2, format_func=lambda d: f"Last {d} days")
+    df = load_summary(days)
+    if df.empty:
+        st.info("No diagnoses recorded in this period.")
+        return
+
+    diseases = st.multiselect("Disease", sorted(df["disease"].unique()), default=sorted(df["disease"].unique()))
+    df = df[df["disease"].isin(diseases)]
+    if df.empty:
+        return
+
+    total = int(df["record_count"].sum())
+    high_risk = int(df.loc[df["diagnosis_result"] == "High Risk", "record_count"].sum())
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Diagnoses", total)
+    col2.metric("High-risk rate", f"{100 * high_risk / total:.1f}%")
+    col3.metric("Avg. confidence", f"{df['confidence_sum'].sum() / total:.1f}%")
+
+    st.markdown("### 🦠 Diagnoses per Disease")
+    st.bar_chart(df.pivot_table(index="disease", columns="diagnosis_result",
+                                values="record_count", aggfunc="sum", fill_value=0))
+
+    st.markdown("### 📅 Daily Volume")
+    st.line_chart(df.pivot_table(index="day", columns="disease",
+                                 values="record_count", aggfunc="sum", fill_value=0))
+
+    st.markdown("### 🧍 Age / Gender Breakdown")
+    st.dataframe(df.pivot_table(index="age_band", columns="gender",
+                                values="record_count", aggfunc="sum", fill_value=0))
+
+    st.markdown("### 🩺 Per-Clinician Volume")
+    st.dataframe(df.groupby("clinician")["record_count"].sum().sort_values(ascending=False))
+
+
+if __name__ == "__main__":
+    # Can be run from cron to keep the summary warm between dashboard loads
+    init_analytics_tables()
+    print(f"✅ Folded {refresh_summary()} summary rows.")
@@ -0,0 +1,144 @@
+# build_cache.py
+# Content-addressed cache for the training scripts (p1.py, p2.py, p3.py).
+#
+# Every stage is keyed by a hash of its code, its parameters, the keys of the
+# stages it consumes and the installed library versions; input files are keyed
+# by their content. Stages are lazy: a stage is only loaded or computed when a
+# later stage (or the script) needs its value, so an unchanged rerun reads just
+# the final outputs from disk.
+import hashlib
+import inspect
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import joblib
+
+CACHE_DIR = ".build_cache"
+MAX_CACHE_BYTES = 2 * 1024 ** 3
+
+
+def _library_versions():
+    import numpy
+    import pandas
+    import sklearn
+    return {
+        "python": platform.python_version(),
+        "numpy": numpy.__version__,
+        "pandas": pandas.__version__,
+        "sklearn": sklearn.__version__,
+        "joblib": joblib.__version__,
+    }
+
+def _code_fingerprint(fn):
+    try:
+        return inspect.getsource(fn)
+    except (OSError, TypeError):
+        # Library callables (e.g. pd.read_csv) are covered by the library versions
+        return f"{getattr(fn, '__module__', '')}.{getattr(fn, '__qualname__', repr(fn))}"
+
+def _file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class Artifact:
+    """Output of a stage (or an input file), identified by its cache key."""
+
+    def __init__(self, cache, name, key, compute=None, value=None):
+        self.cache = cache
+        self.name = name
+        self.key = key
+        self._compute = compute
+        self._value = value
+        self._resolved = compute is None
+
+    @property
+    def value(self):
+        if not self._resolved:
+            self._value = self.cache._resolve(self)
+            self._resolved = True
+        return self._value
+
+
+class BuildCache:
+    def __init__(self, pipeline, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.pipeline = pipeline
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.libraries = _library_versions()
+        self.stats = {}
+        self._nested = []
+
+    def file(self, path):
+        """Declare an input file; its content hash becomes part of downstream keys."""
+        return Artifact(self, path, _file_digest(path), value=path)
+
+    def stage(self, name, fn, *deps, **params):
+        """Declare fn(*dep values, **params) as a cached stage, returns a lazy Artifact."""
+        spec = json.dumps({
+            "pipeline": self.pipeline,
+            "stage": name,
+            "code": _code_fingerprint(fn),
+            "deps": [d.key for d in deps],
+            "params": params,
+            "libraries": self.libraries,
+        }, sort_keys=True, default=repr)
+        key = hashlib.sha256(spec.encode()).hexdigest()
+        self.stats.setdefault(name, {"status": "skipped", "seconds": 0.0})
+        return Artifact(self, name, key, compute=lambda: fn(*[d.value for d in deps], **params))
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.pkl")
+
+    def _resolve(self, artifact):
+        path = self._path(artifact.key)
+        start = time.perf_counter()
+        self._nested.append(0.0)
+        if os.path.exists(path):
+            value = joblib.load(path)
+            os.utime(path)  # mark as recently used for eviction
+            status = "hit"
+        else:
+            value = artifact._compute()
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+            os.close(fd)
+            joblib.dump(value, tmp)
+            os.replace(tmp, path)
+            status = "miss"
+            self.evict()
+        # Report only this stage's own time, not the upstream stages it pulled in
+        elapsed = time.perf_counter() - start
+        upstream = self._nested.pop()
+        if self._nested:
+            self._nested[-1] += elapsed
+        self.stats[artifact.name] = {"status": status, "seconds": elapsed - upstream}
+        return value
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for f in files:
+                if f.endswith(".pkl"):
+                    path = os.path.join(root, f)
+                    st = os.stat(path)
+                    entries.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    def report(self, file=sys.stdout):
+        print(f"📦 Build cache [{self.pipeline}]", file=file)
+        for name, s in self.stats.items():
+            print(f"   {name:<12} {s['status'].upper():<8} {s['seconds']:.2f}s", file=file)
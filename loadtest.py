@@ -0,0 +1,686 @@
+# loadtest.py
+# Finds how many clinicians one app.py server can serve at once. Starts a real
+# `streamlit run app.py` process, drives it with concurrent websocket clients
+# that speak the same protocol as the browser, and reports per-step latency,
+# throughput, server CPU/RSS and Postgres connection counts.
+#
+#   python loadtest.py --users 20 --iterations 3
+#   python loadtest.py --users 50 --dsn postgresql://postgres@localhost:5433/medical_ai_load
+#   python loadtest.py --mode apptest --users 10
+#
+# Without --dsn a throwaway Postgres cluster is started with initdb/pg_ctl and
+# removed afterwards.
+#
+# Run p1.py, p2.py and p3.py first so models/ exists. The app is copied into a
+# temporary directory, so predictions appended to bp.csv / lungcancer.csv there
+# never touch the real datasets.
+#
+# Server mode (the default) is the sizing measurement: all sessions share the
+# server's caches, model registry, GIL and memory, and editing a diagnosis form
+# reruns only its fragment, as in a browser. Clients are threads of this
+# process; if client_cpu_percent nears 100%, the harness is the bottleneck.
+#
+# AppTest mode runs each virtual user in its own process without a server
+# (AppTest installs a process-global Runtime, so sessions cannot share one).
+# Its results are per-process: caches are not shared, RSS is summed over all
+# processes and every interaction is a full script rerun. Use it to compare
+# script changes, not to size a server.
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import queue
+import random
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from collections import defaultdict
+
+import numpy as np
+import psycopg2
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState, WidgetStates
+from streamlit.runtime.state.common import user_key_from_element_id
+from streamlit.testing.v1 import AppTest
+from websockets.sync.client import connect
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+APP_FILES = [
+    "app.py", "patient_history.py", "analytics.py", "model_registry.py", "question_bank.py",
+    "quiz_questions.json", "bp.csv", "diabetes.csv", "lungcancer.csv"
+]
+RUN_TIMEOUT = 60
+SERVER_START_TIMEOUT = 60
+PASSWORD = "loadtest-password"
+
+
+# ---------------- DATABASE STAND-IN ----------------
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("localhost", 0))
+        return s.getsockname()[1]
+
+def start_ephemeral_postgres(max_connections):
+    """Start a throwaway Postgres cluster in a temp dir, returns (dsn, stop)."""
+    initdb, pg_ctl = shutil.which("initdb"), shutil.which("pg_ctl")
+    if not initdb or not pg_ctl:
+        raise SystemExit("❌ initdb/pg_ctl not found on PATH; pass --dsn instead.")
+
+    datadir = tempfile.mkdtemp(prefix="medical_ai_pg_")
+    port = _free_port()
+    subprocess.run([initdb, "-D", datadir, "-U", "postgres", "--auth=trust"],
+                   check=True, stdout=subprocess.DEVNULL)
+    subprocess.run([pg_ctl, "-D", datadir, "-l", os.path.join(datadir, "server.log"), "-w",
+                    "-o", f"-p {port} -k {datadir} -c max_connections={max_connections}", "start"],
+                   check=True, stdout=subprocess.DEVNULL)
+
+    conn = psycopg2.connect(host="localhost", port=port, user="postgres", dbname="postgres")
+    conn.autocommit = True
+    conn.cursor().execute("CREATE DATABASE medical_ai")
+    conn.close()
+
+    def stop():
+        subprocess.run([pg_ctl, "-D", datadir, "-m", "fast", "-w", "stop"],
+                       check=False, stdout=subprocess.DEVNULL)
+        shutil.rmtree(datadir, ignore_errors=True)
+
+    return f"postgresql://postgres@localhost:{port}/medical_ai", stop
+
+def prepare_workdir(src):
+    workdir = tempfile.mkdtemp(prefix="medical_ai_app_")
+    for name in APP_FILES:
+        if os.path.exists(os.path.join(src, name)):
+            shutil.copy(os.path.join(src, name), workdir)
+    if not os.path.isdir(os.path.join(src, "models", "registry")):
+        raise SystemExit("❌ models/ not found; run p1.py, p2.py and p3.py first.")
+    shutil.copytree(os.path.join(src, "models"), os.path.join(workdir, "models"))
+    return workdir
+
+
+# ---------------- STREAMLIT SERVER ----------------
+def start_server(workdir, dsn):
+    """Start `streamlit run app.py` in workdir, returns (process, websocket url)."""
+    port = _free_port()
+    log_path = os.path.join(workdir, "server.log")
+    with open(log_path, "wb") as log:
+        server = subprocess.Popen(
+            [sys.executable, "-m", "streamlit", "run", "app.py",
+             "--server.headless=true", "--server.address=localhost", f"--server.port={port}",
+             "--server.fileWatcherType=none", "--browser.gatherUsageStats=false"],
+            cwd=workdir, env={**os.environ, "MEDICAL_AI_DSN": dsn}, stdout=log, stderr=subprocess.STDOUT
+        )
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while True:
+        try:
+            with urllib.request.urlopen(f"http://localhost:{port}/_stcore/health", timeout=1) as r:
+                if r.status == 200:
+                    return server, f"ws://localhost:{port}/_stcore/stream"
+        except OSError:
+            pass
+        if server.poll() is not None or time.monotonic() > deadline:
+            server.kill()
+            with open(log_path, errors="replace") as f:
+                raise SystemExit(f"❌ streamlit server did not start:\n{f.read()[-2000:]}")
+        time.sleep(0.2)
+
+
+# ---------------- RESOURCE SAMPLER ----------------
+def _rss_bytes(pid):
+    # None once the process has exited between samples
+    if psutil:
+        try:
+            return psutil.Process(pid).memory_info().rss
+        except psutil.Error:
+            return None
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return None
+
+def _cpu_seconds(pid):
+    if psutil:
+        times = psutil.Process(pid).cpu_times()
+        return times.user + times.system
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+class ResourceSampler(threading.Thread):
+    """Samples summed RSS of `pids` and database connection count in the background."""
+
+    def __init__(self, dsn, pids, interval=0.5):
+        super().__init__(daemon=True)
+        self.dsn = dsn
+        self.interval = interval
+        self.pids = list(pids)
+        self.rss = []
+        self.db_connections = []
+        self._stop_event = threading.Event()
+
+    def _rss_total(self):
+        sizes = [size for size in map(_rss_bytes, list(self.pids)) if size is not None]
+        return sum(sizes) if sizes else None
+
+    def run(self):
+        conn = psycopg2.connect(self.dsn)
+        conn.autocommit = True
+        cur = conn.cursor()
+        while not self._stop_event.is_set():
+            cur.execute("""
+                SELECT count(*) FROM pg_stat_activity
+                WHERE datname = current_database() AND pid <> pg_backend_pid()
+            """)
+            self.db_connections.append(cur.fetchone()[0])
+            rss = self._rss_total()
+            if rss is not None:
+                self.rss.append(rss)
+            self._stop_event.wait(self.interval)
+        cur.close()
+        conn.close()
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+# ---------------- SESSIONS ----------------
+class AppTestSession:
+    """app.py run in this process by AppTest; every interaction is a full rerun."""
+
+    def __init__(self):
+        self.at = AppTest.from_file(os.path.abspath("app.py"), default_timeout=RUN_TIMEOUT)
+
+    def run(self):
+        self.at.run()
+        if self.at.exception:
+            raise RuntimeError(self.at.exception[0].message)
+
+    def widgets(self, kind):
+        return list(getattr(self.at, kind))
+
+    def close(self):
+        pass
+
+
+class ServerWidget:
+    """A widget rendered by the server; setting it queues its state for the next run."""
+
+    def __init__(self, session, kind, proto, fragment_id):
+        self.session = session
+        self.kind = kind
+        self.proto = proto
+        self.fragment_id = fragment_id
+        self.id = proto.id
+        self.key = user_key_from_element_id(proto.id)
+        self.label = proto.label
+
+    @property
+    def options(self):
+        return list(self.proto.options)
+
+    def set_value(self, value):
+        state = WidgetState(id=self.id)
+        if self.kind == "number_input":
+            state.double_value = value
+        elif self.kind in ("selectbox", "radio"):
+            # The server receives the formatted option, as the browser sends it
+            if str(value) not in self.options:
+                raise ValueError(f"{value!r} is not an option of {self.label!r}")
+            state.string_value = str(value)
+        else:
+            state.string_value = value
+        self.session.queue(self, state)
+        return self
+
+    input = select = set_value
+
+    def click(self):
+        self.session.queue(self, WidgetState(id=self.id, trigger_value=True))
+        return self
+
+
+class ServerSession:
+    """One browser tab: a websocket to the server sending what the frontend would."""
+
+    def __init__(self, url):
+        self._exit = contextlib.ExitStack()
+        self.ws = self._exit.enter_context(
+            connect(url, subprotocols=["streamlit"], max_size=None, open_timeout=RUN_TIMEOUT))
+        self.elements = {}  # delta path -> (fragment id, element type, proto)
+        self.values = {}    # widget id -> last state set, re-sent while the widget is rendered
+        self.triggers = []
+        self.fragments = set()
+
+    def queue(self, widget, state):
+        if state.WhichOneof("value") == "trigger_value":
+            self.triggers.append(state)
+        else:
+            self.values[widget.id] = state
+        self.fragments.add(widget.fragment_id)
+
+    def _rendered_ids(self):
+        return {proto.id for _, kind, proto in self.elements.values() if kind != "block" and hasattr(proto, "id")}
+
+    def run(self):
+        # Like the browser: a change to widgets of a single fragment reruns only that fragment
+        fragment_id = next(iter(self.fragments)) if len(self.fragments) == 1 else ""
+        rendered = self._rendered_ids()
+        msg = BackMsg()
+        msg.rerun_script.widget_states.CopyFrom(WidgetStates(
+            widgets=[s for wid, s in self.values.items() if wid in rendered] + self.triggers
+        ))
+        msg.rerun_script.fragment_id = fragment_id
+        self.triggers, self.fragments = [], set()
+        if fragment_id:
+            self.elements = {p: e for p, e in self.elements.items() if e[0] != fragment_id}
+        else:
+            self.elements = {}
+        self.ws.send(msg.SerializeToString())
+
+        error = None
+        while True:
+            reply = ForwardMsg()
+            reply.ParseFromString(self.ws.recv(timeout=RUN_TIMEOUT))
+            kind = reply.WhichOneof("type")
+            if kind == "delta":
+                element_type = self._apply(reply)
+                if element_type == "exception" and error is None:
+                    error = reply.delta.new_element.exception.message
+            elif kind == "script_finished":
+                if reply.script_finished == ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    # st.rerun(): a full run follows and re-sends every element
+                    self.elements = {}
+                    continue
+                if reply.script_finished == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+                    error = error or "app.py failed to compile"
+                break
+        rendered = self._rendered_ids()
+        self.values = {wid: s for wid, s in self.values.items() if wid in rendered}
+        if error:
+            raise RuntimeError(error)
+
+    def _apply(self, msg):
+        delta = msg.delta
+        path = tuple(msg.metadata.delta_path)
+        if delta.WhichOneof("type") == "new_element":
+            element_type = delta.new_element.WhichOneof("type")
+            self.elements[path] = (delta.fragment_id, element_type, getattr(delta.new_element, element_type))
+            return element_type
+        if delta.WhichOneof("type") == "add_block":
+            self.elements[path] = (delta.fragment_id, "block", delta.add_block)
+        return None
+
+    def widgets(self, kind):
+        return [ServerWidget(self, kind, proto, fragment_id)
+                for _, (fragment_id, element_type, proto) in sorted(self.elements.items())
+                if element_type == kind]
+
+    def close(self):
+        self._exit.close()
+
+
+# ---------------- VIRTUAL USER ----------------
+class VirtualUser:
+    """One clinician: opens a new session (browser tab) per iteration and runs scripted steps."""
+
+    def __init__(self, index, open_session, results, errors):
+        self.index = index
+        self.email = f"loadtest{index}@example.com"
+        self.open_session = open_session
+        self.results = results
+        self.errors = errors
+        self.session = None
+        self.rng = random.Random(index)
+
+    def step(self, name):
+        start = time.perf_counter()
+        try:
+            self.session.run()
+        except Exception as e:
+            self.errors[name].append(str(e))
+            raise
+        finally:
+            self.results[name].append(time.perf_counter() - start)
+
+    def find(self, kind, label=None, key=None):
+        for w in self.session.widgets(kind):
+            if (key is not None and w.key == key) or (key is None and w.label == label and w.key is None):
+                return w
+        return None
+
+    def widget(self, kind, label=None, key=None):
+        w = self.find(kind, label, key)
+        if w is None:
+            raise LookupError(f"{kind} {label or key!r} not rendered")
+        return w
+
+    # --- Scripts ---
+    def login(self, signup):
+        self.session = self.open_session()
+        self.step("open")
+        if signup:
+            self.widget("text_input", "Name").input(f"Load Test {self.index}")
+            self.widget("text_input", key="signup_email").input(self.email)
+            self.widget("text_input", key="signup_password").input(PASSWORD)
+            self.widget("button", "Sign Up").click()
+            self.step("signup")
+
+        self.widget("text_input", "Email").input(self.email)
+        self.widget("text_input", "Password").input(PASSWORD)
+        self.widget("button", "Sign In").click()
+        self.step("login")
+
+    def open_mode(self, label):
+        self.widget("button", label).click()
+        self.step("mode_open")
+
+    def diabetes(self):
+        self.widget("selectbox", "Select Disease").select("Diabetes")
+        self.step("diagnosis:select")
+        self.widget("text_input", "First Name").input(f"Load{self.index}")
+        self.step("diagnosis:edit")
+        self.widget("text_input", "Last Name").input(self.rng.choice(["Smith", "Patel", "Garcia", "Chen"]))
+        self.step("diagnosis:edit")
+        self.widget("text_input", "Phone Number").input(f"555{self.index:04d}{self.rng.randint(0, 99):02d}")
+        self.step("diagnosis:edit")
+        self.widget("number_input", "Age").set_value(self.rng.randint(20, 85))
+        self.step("diagnosis:edit")
+        self.widget("number_input", "HbA1c Level").set_value(round(self.rng.uniform(4.0, 10.0), 1))
+        self.step("diagnosis:edit")
+        self.widget("number_input", "Blood Glucose Level").set_value(self.rng.randint(70, 300))
+        self.step("diagnosis:edit")
+        self.widget("button", key="predict_diabetes_btn").click()
+        self.step("predict:diabetes")
+
+    def blood_pressure(self):
+        self.widget("selectbox", "Select Disease").select("Blood Pressure Abnormality")
+        self.step("diagnosis:select")
+        self.widget("number_input", "Age:").set_value(self.rng.randint(20, 85))
+        self.step("diagnosis:edit")
+        self.widget("number_input", "BMI:").set_value(round(self.rng.uniform(18.0, 40.0), 1))
+        self.step("diagnosis:edit")
+        self.widget("button", "Predict BP Risk").click()
+        self.step("predict:bp")
+
+    def lung_cancer(self):
+        self.widget("selectbox", "Select Disease").select("Lung Cancer")
+        self.step("diagnosis:select")
+        self.widget("number_input", "Age").set_value(self.rng.randint(20, 85))
+        self.step("diagnosis:edit")
+        self.widget("button", "Predict Lung Cancer Risk").click()
+        self.step("predict:lung")
+
+    def history(self):
+        self.widget("selectbox", "Select Disease").select("Diabetes")
+        self.step("diagnosis:select")
+        self.widget("text_input", key="patient_lookup").input(self.rng.choice(["Load", "Smi", "555"]))
+        self.step("history:lookup")
+
+    def analytics(self):
+        days = self.rng.choice([7, 30, 90])
+        # AppTest takes the raw option; the browser sends the formatted label
+        period = self.widget("selectbox", "Period")
+        period.select(days if isinstance(self.session, AppTestSession) else f"Last {days} days")
+        self.step("analytics:period")
+        self.widget("button", key="analytics_back").click()
+        self.step("mode_back")
+
+    def quiz(self):
+        self.widget("selectbox", "Select Disease for Training").select(
+            self.rng.choice(["Diabetes", "Blood Pressure Abnormality", "Lung Cancer"]))
+        self.step("training:select")
+        self.widget("button", "Start Quiz").click()
+        self.step("training:start")
+        number = 0
+        while self.find("button", "⬅️ Back to Mode Selection") is None:
+            radio = self.widget("radio", key=f"q{number}")
+            radio.set_value(self.rng.choice(radio.options))
+            self.widget("button", "Submit Answer").click()
+            self.step("training:answer")
+            self.widget("button", "Next Question ➡️").click()
+            self.step("training:next")
+            number += 1
+        self.widget("button", "⬅️ Back to Mode Selection").click()
+        self.step("mode_back")
+
+    def run(self, iterations, think_time):
+        for i in range(iterations):
+            self.login(signup=i == 0)
+            try:
+                self.open_mode("🧠 Training Mode")
+                self.quiz()
+                time.sleep(self.rng.uniform(0, think_time))
+                self.open_mode("📊 Analytics")
+                self.analytics()
+                time.sleep(self.rng.uniform(0, think_time))
+                # Diagnosis Mode has no way back to mode selection, so it ends the session
+                self.open_mode("🩺 Diagnosis Mode")
+                for script in (self.diabetes, self.blood_pressure, self.lung_cancer, self.history):
+                    script()
+                    time.sleep(self.rng.uniform(0, think_time))
+            finally:
+                self.session.close()
+
+
+# ---------------- SERVER MODE ----------------
+def run_server(args, dsn, workdir):
+    server, url = start_server(workdir, dsn)
+    results, errors = defaultdict(list), defaultdict(list)
+    sampler = ResourceSampler(dsn, [server.pid])
+    try:
+        # One session first so init_db() creates the schema and the model registry is loaded
+        warmup = ServerSession(url)
+        warmup.run()
+        warmup.close()
+
+        sampler.start()
+        wall_start = time.perf_counter()
+        server_cpu_start, client_cpu_start = _cpu_seconds(server.pid), time.process_time()
+
+        def worker(i):
+            time.sleep(args.ramp_up * i / max(args.users, 1))
+            try:
+                VirtualUser(i, lambda: ServerSession(url), results, errors).run(args.iterations, args.think_time)
+            except Exception as e:
+                errors["session"].append(repr(e))
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.users)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        elapsed = time.perf_counter() - wall_start
+        cpu_seconds = _cpu_seconds(server.pid) - server_cpu_start
+        client_cpu_seconds = time.process_time() - client_cpu_start
+        sampler.stop()
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    return results, errors, elapsed, cpu_seconds, client_cpu_seconds, sampler
+
+
+# ---------------- APPTEST MODE ----------------
+def _warmup(workdir, results):
+    """One session first so init_db() creates the schema before users race on it."""
+    os.chdir(workdir)
+    try:
+        AppTestSession().run()
+        results.put(None)
+    except Exception as e:
+        results.put(str(e))
+
+def _session(workdir, index, delay, iterations, think_time, results):
+    os.chdir(workdir)
+    time.sleep(delay)
+    latencies, errors = defaultdict(list), defaultdict(list)
+    try:
+        VirtualUser(index, AppTestSession, latencies, errors).run(iterations, think_time)
+    except Exception as e:
+        errors["session"].append(repr(e))
+    results.put((dict(latencies), dict(errors)))
+
+def run_apptest(args, dsn, workdir):
+    results, errors = defaultdict(list), defaultdict(list)
+    sampler = ResourceSampler(dsn, [os.getpid()])
+    # spawn, not fork: each user gets a fresh interpreter and its own Streamlit Runtime
+    ctx = multiprocessing.get_context("spawn")
+    outbox = ctx.Queue()
+    warmup = ctx.Process(target=_warmup, args=(workdir, outbox))
+    warmup.start()
+    warmup_error = outbox.get(timeout=RUN_TIMEOUT * 5)
+    warmup.join()
+    if warmup_error:
+        raise SystemExit(f"❌ app.py failed to start: {warmup_error}")
+
+    sampler.start()
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    children_start = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    procs = [
+        ctx.Process(target=_session, args=(workdir, i, args.ramp_up * i / max(args.users, 1),
+                                           args.iterations, args.think_time, outbox))
+        for i in range(args.users)
+    ]
+    for p in procs:
+        p.start()
+        sampler.pids.append(p.pid)
+
+    # Drain the queue before joining: a child blocks on exit until its result is read
+    received = 0
+    while received < len(procs):
+        try:
+            latencies, user_errors = outbox.get(timeout=1)
+        except queue.Empty:
+            if any(p.is_alive() for p in procs):
+                continue
+            errors["session"].extend(["process exited without reporting"] * (len(procs) - received))
+            break
+        received += 1
+        for name, values in latencies.items():
+            results[name].extend(values)
+        for name, values in user_errors.items():
+            errors[name].extend(values)
+    for p in procs:
+        p.join()
+
+    elapsed = time.perf_counter() - wall_start
+    children_end = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu_seconds = (time.process_time() - cpu_start
+                   + children_end.ru_utime - children_start.ru_utime
+                   + children_end.ru_stime - children_start.ru_stime)
+    sampler.stop()
+    return results, errors, elapsed, cpu_seconds, None, sampler
+
+
+# ---------------- REPORT ----------------
+def summarize(mode, results, errors, elapsed, cpu_seconds, client_cpu_seconds, sampler, users):
+    steps = {}
+    for name, latencies in sorted(results.items()):
+        ms = np.array(latencies) * 1000
+        steps[name] = {
+            "count": len(ms),
+            "errors": len(errors.get(name, [])),
+            "p50_ms": round(float(np.percentile(ms, 50)), 1),
+            "p90_ms": round(float(np.percentile(ms, 90)), 1),
+            "p95_ms": round(float(np.percentile(ms, 95)), 1),
+            "p99_ms": round(float(np.percentile(ms, 99)), 1),
+            "max_ms": round(float(ms.max()), 1),
+        }
+    total_steps = sum(s["count"] for s in steps.values())
+    rss_peak = round(max(sampler.rss) / 2**20, 1) if sampler.rss else None
+    report = {
+        "mode": mode,
+        "users": users,
+        "elapsed_s": round(elapsed, 2),
+        "steps_total": total_steps,
+        "throughput_steps_per_s": round(total_steps / elapsed, 2) if elapsed else 0.0,
+        "cpu_percent": round(100 * cpu_seconds / elapsed, 1) if elapsed else 0.0,
+        "db_connections_peak": max(sampler.db_connections, default=0),
+        "db_connections_mean": round(float(np.mean(sampler.db_connections)), 1) if sampler.db_connections else 0.0,
+        "steps": steps,
+    }
+    if mode == "server":
+        report["rss_peak_mb"] = rss_peak
+        report["client_cpu_percent"] = round(100 * client_cpu_seconds / elapsed, 1) if elapsed else 0.0
+    else:
+        # Sum over independent interpreters, each with its own copy of models and caches
+        report["rss_sum_peak_mb"] = rss_peak
+    return report
+
+def print_report(report):
+    if report["mode"] == "server":
+        print(f"\n🖥️ Server mode: one `streamlit run app.py` process served every session; "
+              f"CPU and RSS are that process's.")
+        resources = (f"🧮 server CPU {report['cpu_percent']}% | 💾 server RSS peak {report['rss_peak_mb']} MB | "
+                     f"🧪 client CPU {report['client_cpu_percent']}%")
+    else:
+        print("\n🧪 AppTest mode, per-process results: each user ran in its own interpreter without a server. "
+              "Caches are not shared, RSS is summed over processes and every step is a full rerun. "
+              "Not a server sizing measurement; use the default server mode for that.")
+        resources = (f"🧮 CPU {report['cpu_percent']}% (all processes) | "
+                     f"💾 RSS sum peak {report['rss_sum_peak_mb']} MB")
+    print(f"👥 {report['users']} users | ⏱️ {report['elapsed_s']}s | "
+          f"🔁 {report['throughput_steps_per_s']} steps/s | {resources} | "
+          f"🐘 DB conns peak {report['db_connections_peak']} (mean {report['db_connections_mean']})\n")
+    print(f"{'step':<20}{'count':>7}{'err':>5}{'p50':>9}{'p90':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for name, s in report["steps"].items():
+        print(f"{name:<20}{s['count']:>7}{s['errors']:>5}{s['p50_ms']:>9}{s['p90_ms']:>9}"
+              f"{s['p95_ms']:>9}{s['p99_ms']:>9}{s['max_ms']:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-session load test for app.py")
+    parser.add_argument("--mode", choices=["server", "apptest"], default="server",
+                        help="drive one real streamlit server (default) or one AppTest process per user")
+    parser.add_argument("--users", type=int, default=10, help="simultaneous sessions")
+    parser.add_argument("--iterations", type=int, default=2, help="sessions (login + scripts) per user")
+    parser.add_argument("--ramp-up", type=float, default=5.0, help="seconds over which sessions start")
+    parser.add_argument("--think-time", type=float, default=0.5, help="max pause between scripts (s)")
+    parser.add_argument("--dsn", help="database to run against (default: start an ephemeral one)")
+    parser.add_argument("--max-connections", type=int, default=100, help="max_connections of the ephemeral server")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    stop_db = None
+    dsn = args.dsn
+    if not dsn:
+        dsn, stop_db = start_ephemeral_postgres(args.max_connections)
+    os.environ["MEDICAL_AI_DSN"] = dsn
+
+    src = os.path.dirname(os.path.abspath(__file__))
+    workdir = prepare_workdir(src)
+    try:
+        run = run_server if args.mode == "server" else run_apptest
+        results, errors, elapsed, cpu_seconds, client_cpu_seconds, sampler = run(args, dsn, workdir)
+    finally:
+        if stop_db:
+            stop_db()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = summarize(args.mode, results, errors, elapsed, cpu_seconds, client_cpu_seconds, sampler, args.users)
+    report["failed_sessions"] = len(errors.get("session", []))
+    print_report(report)
+    if report["failed_sessions"]:
+        print(f"\n⚠️ {report['failed_sessions']} sessions aborted, first error: {errors['session'][0]}")
+    if args.json:
+        with open(os.path.join(src, args.json), "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
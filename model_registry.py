@@ -0,0 +1,269 @@
+# model_registry.py
+# Versioned model bundles. Each training run publishes a new directory
+#
+#   models/registry/<name>/<version>/{<artifact>.pkl, manifest.json}
+#
+# and then flips models/registry/<name>/CURRENT to it with an atomic rename.
+# Bundles are never modified after publishing, so old versions stay on disk
+# for rollback.
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import joblib
+
+REGISTRY_DIR = os.path.join("models", "registry")
+POLL_INTERVAL = 5.0
+
+# Flat pickles written by the training scripts before the registry existed
+LEGACY_DIR = "models"
+LEGACY_FILES = {
+    "diabetes": {"model": "diabetes_model.pkl", "encoders": "diabetes_encoders.pkl",
+                 "imputer": "diabetes_imputer.pkl", "features": "diabetes_features.pkl"},
+    "bp": {"model": "bp_model.pkl", "scaler": "bp_scaler.pkl", "features": "bp_features.pkl"},
+    "lungcancer": {"rf_model": "lungcancer_rf_model.pkl", "logreg_model": "lungcancer_logreg_model.pkl",
+                   "scaler": "lungcancer_scaler.pkl", "features": "lungcancer_features.pkl"},
+}
+# Artifacts the app cannot predict without; the others are imported when present
+LEGACY_REQUIRED = {
+    "diabetes": {"model", "encoders", "features"},
+    "bp": {"model", "scaler", "features"},
+    "lungcancer": {"rf_model", "scaler", "features"},
+}
+TRAINING_SCRIPTS = {"diabetes": "p1.py", "bp": "p2.py", "lungcancer": "p3.py"}
+
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def _write_json_atomic(path, data):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    with os.fdopen(fd, "w") as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def _library_versions():
+    import sklearn
+    import pandas
+    import numpy
+    return {"sklearn": sklearn.__version__, "pandas": pandas.__version__, "numpy": numpy.__version__}
+
+
+# ---------------- PUBLISHING ----------------
+def publish_bundle(name, artifacts, features, metrics=None, activate=True, registry_dir=REGISTRY_DIR):
+    """Write artifacts as a new immutable version of `name`, returns the version id."""
+    model_dir = os.path.join(registry_dir, name)
+    os.makedirs(model_dir, exist_ok=True)
+
+    # Stage in a hidden dir, then rename into place so readers never see a partial bundle
+    staging = tempfile.mkdtemp(dir=model_dir, prefix=".staging-")
+    files = {}
+    for key, obj in artifacts.items():
+        path = os.path.join(staging, f"{key}.pkl")
+        joblib.dump(obj, path)
+        files[key] = _sha256(path)
+
+    content_hash = hashlib.sha256(
+        "".join(f"{k}:{files[k]}" for k in sorted(files)).encode()
+    ).hexdigest()
+    # Retraining on unchanged inputs reproduces the same bytes; keep serving that version
+    active = read_pointer(name, registry_dir)
+    if activate and active:
+        with open(os.path.join(model_dir, active["version"], "manifest.json")) as f:
+            if json.load(f)["content_hash"] == content_hash:
+                shutil.rmtree(staging)
+                return active["version"]
+
+    version = f"{datetime.now():%Y%m%dT%H%M%S}-{content_hash[:8]}"
+    manifest = {
+        "name": name,
+        "version": version,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "content_hash": content_hash,
+        "files": files,
+        "features": [str(f) for f in features],
+        "metrics": metrics or {},
+        "libraries": _library_versions(),
+    }
+    _write_json_atomic(os.path.join(staging, "manifest.json"), manifest)
+    os.rename(staging, os.path.join(model_dir, version))
+
+    if activate:
+        activate_version(name, version, registry_dir)
+    return version
+
+def import_legacy_bundle(name, legacy_dir=LEGACY_DIR, registry_dir=REGISTRY_DIR):
+    """Publish the pre-registry models/<name>_*.pkl files as the first version of `name`.
+
+    Returns the version id, or None when the legacy files are missing.
+    """
+    artifacts = {}
+    for key, filename in LEGACY_FILES.get(name, {}).items():
+        path = os.path.join(legacy_dir, filename)
+        if os.path.exists(path):
+            artifacts[key] = joblib.load(path)
+    if not LEGACY_REQUIRED.get(name) or not LEGACY_REQUIRED[name] <= artifacts.keys():
+        return None
+    return publish_bundle(name, artifacts, features=list(artifacts["features"]),
+                          metrics={"imported_from": legacy_dir}, registry_dir=registry_dir)
+
+def read_pointer(name, registry_dir=REGISTRY_DIR):
+    path = os.path.join(registry_dir, name, "CURRENT")
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def activate_version(name, version, registry_dir=REGISTRY_DIR):
+    if not os.path.isdir(os.path.join(registry_dir, name, version)):
+        raise FileNotFoundError(f"No version {version} of {name}")
+    pointer = read_pointer(name, registry_dir) or {}
+    if pointer.get("version") == version:
+        return
+    _write_json_atomic(os.path.join(registry_dir, name, "CURRENT"),
+                       {"version": version, "previous": pointer.get("version")})
+
+def rollback(name, registry_dir=REGISTRY_DIR):
+    """Point CURRENT back at the previously active version, returns it."""
+    pointer = read_pointer(name, registry_dir)
+    if not pointer or not pointer.get("previous"):
+        raise ValueError(f"No previous version of {name} to roll back to")
+    activate_version(name, pointer["previous"], registry_dir)
+    return pointer["previous"]
+
+def list_versions(name, registry_dir=REGISTRY_DIR):
+    model_dir = os.path.join(registry_dir, name)
+    if not os.path.isdir(model_dir):
+        return []
+    return sorted(v for v in os.listdir(model_dir)
+                  if not v.startswith(".") and os.path.isdir(os.path.join(model_dir, v)))
+
+
+# ---------------- LOADING ----------------
+class ModelBundle:
+    """All artifacts of one published version, loaded and hash-checked together."""
+
+    def __init__(self, name, version, registry_dir=REGISTRY_DIR):
+        path = os.path.join(registry_dir, name, version)
+        with open(os.path.join(path, "manifest.json")) as f:
+            self.manifest = json.load(f)
+        self.name = name
+        self.version = version
+        self.artifacts = {}
+        for key, digest in self.manifest["files"].items():
+            file_path = os.path.join(path, f"{key}.pkl")
+            if _sha256(file_path) != digest:
+                raise ValueError(f"{name} {version}: {key}.pkl does not match its manifest hash")
+            self.artifacts[key] = joblib.load(file_path)
+
+    def __getitem__(self, key):
+        return self.artifacts[key]
+
+
+class ModelRegistry:
+    """Serves the active bundle per model and hot-swaps it when CURRENT changes.
+
+    Callers take one bundle via current(name) per prediction, so a swap in the
+    middle of a prediction cannot mix artifacts from two versions. New versions
+    are loaded on a background thread and swapped in with a single assignment.
+    """
+
+    def __init__(self, names, registry_dir=REGISTRY_DIR, poll_interval=POLL_INTERVAL):
+        self.registry_dir = registry_dir
+        self.poll_interval = poll_interval
+        self._bundles = {}
+        self._previous = {}
+        self._lock = threading.Lock()
+        self._watcher = None
+        for name in names:
+            pointer = read_pointer(name, registry_dir)
+            if pointer is None:
+                # One-time upgrade of deployments that only have the old flat pickles
+                version = import_legacy_bundle(name, registry_dir=registry_dir)
+                if version is not None:
+                    print(f"📦 Imported legacy {name} models as version {version}", file=sys.stderr)
+                    pointer = read_pointer(name, registry_dir)
+            if pointer is None:
+                raise FileNotFoundError(
+                    f"No published {name} model in {registry_dir} and no legacy pickles in {LEGACY_DIR}; "
+                    f"run python {TRAINING_SCRIPTS.get(name, 'the training script')} first."
+                )
+            self._bundles[name] = ModelBundle(name, pointer["version"], registry_dir)
+
+    def current(self, name):
+        return self._bundles[name]
+
+    def _swap(self, name, bundle):
+        with self._lock:
+            old = self._bundles[name]
+            if old.version == bundle.version:
+                return
+            self._previous[name] = old
+            self._bundles[name] = bundle
+
+    def refresh(self):
+        """Bring every model in line with its CURRENT pointer."""
+        for name in list(self._bundles):
+            pointer = read_pointer(name, self.registry_dir)
+            if not pointer or pointer["version"] == self._bundles[name].version:
+                continue
+            previous = self._previous.get(name)
+            if previous is not None and previous.version == pointer["version"]:
+                # Rollback: the old bundle is still in memory, swap back instantly
+                self._swap(name, previous)
+                continue
+            try:
+                bundle = ModelBundle(name, pointer["version"], self.registry_dir)
+            except Exception as e:
+                print(f"⚠️ Could not load {name} {pointer['version']}, keeping {self._bundles[name].version}: {e}",
+                      file=sys.stderr)
+                continue
+            self._swap(name, bundle)
+
+    def start_watcher(self):
+        if self._watcher is not None:
+            return
+
+        def watch():
+            while True:
+                time.sleep(self.poll_interval)
+                self.refresh()
+
+        self._watcher = threading.Thread(target=watch, name="model-registry-watcher", daemon=True)
+        self._watcher.start()
+
+
+if __name__ == "__main__":
+    # python model_registry.py list <name> | rollback <name> | activate <name> <version> | import-legacy <name>
+    if len(sys.argv) < 3 or sys.argv[1] not in ("list", "rollback", "activate", "import-legacy"):
+        print("usage: python model_registry.py list|rollback|activate|import-legacy <name> [version]")
+        sys.exit(1)
+    command, name = sys.argv[1], sys.argv[2]
+    if command == "list":
+        active = (read_pointer(name) or {}).get("version")
+        for v in list_versions(name):
+            print(f"{'*' if v == active else ' '} {v}")
+    elif command == "rollback":
+        print(f"✅ {name} rolled back to {rollback(name)}")
+    elif command == "import-legacy":
+        version = import_legacy_bundle(name)
+        if version is None:
+            print(f"❌ No legacy {name} pickles in {LEGACY_DIR}")
+            sys.exit(1)
+        print(f"✅ Legacy {name} models published as version {version}")
+    else:
+        activate_version(name, sys.argv[3])
+        print(f"✅ {name} now serving {sys.argv[3]}")
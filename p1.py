@@ -1,48 +1,75 @@
-import os
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder
 from sklearn.impute import SimpleImputer
 from sklearn.ensemble import RandomForestClassifier
-import joblib
+from sklearn.metrics import accuracy_score
+from build_cache import BuildCache
+from model_registry import publish_bundle
 
-# Ensure models folder exists
-os.makedirs("models", exist_ok=True)
+LABEL_COLS = ["gender", "smoking_history"]
 
 # Load dataset
-data = pd.read_csv("diabetes.csv")
+def load_data(path):
+    return pd.read_csv(path)
 
 # Encode categorical
-label_cols = ["gender", "smoking_history"]
-encoders = {}
-for col in label_cols:
-    enc = LabelEncoder()
-    data[col] = enc.fit_transform(data[col].astype(str).str.lower())
-    encoders[col] = enc
+def encode(data, label_cols):
+    data = data.copy()
+    encoders = {}
+    for col in label_cols:
+        enc = LabelEncoder()
+        data[col] = enc.fit_transform(data[col].astype(str).str.lower())
+        encoders[col] = enc
+    return data, encoders
 
-# Features & target
-X = data.drop("diabetes", axis=1)
-y = data["diabetes"]
-
-# Handle NaN
-imputer = SimpleImputer(strategy="mean")
-X = pd.DataFrame(imputer.fit_transform(X), columns=X.columns)
+# Features & target, handle NaN
+def impute(encoded):
+    data, _ = encoded
+    X = data.drop("diabetes", axis=1)
+    y = data["diabetes"]
+    imputer = SimpleImputer(strategy="mean")
+    X = pd.DataFrame(imputer.fit_transform(X), columns=X.columns)
+    return X, y, imputer
 
 # Train-test split
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+def split(imputed, test_size, random_state):
+    X, y, _ = imputed
+    return train_test_split(X, y, test_size=test_size, random_state=random_state)
 
 # Train model
-model = RandomForestClassifier(random_state=42, class_weight="balanced")
-model.fit(X_train, y_train)
+def fit(splits, **hyperparams):
+    X_train, _, y_train, _ = splits
+    model = RandomForestClassifier(**hyperparams)
+    model.fit(X_train, y_train)
+    return model
 
-# Save model + encoders + imputer + features
-joblib.dump(model, "models/diabetes_model.pkl")
-joblib.dump(encoders, "models/diabetes_encoders.pkl")
-joblib.dump(imputer, "models/diabetes_imputer.pkl")
-joblib.dump(X.columns, "models/diabetes_features.pkl")
+# Evaluate and collect everything the app needs
+def package(encoded, imputed, splits, model):
+    _, encoders = encoded
+    X, _, imputer = imputed
+    X_train, X_test, _, y_test = splits
+    return {
+        "artifacts": {"model": model, "encoders": encoders, "imputer": imputer, "features": X.columns},
+        "features": list(X.columns),
+        "metrics": {
+            "accuracy": accuracy_score(y_test, model.predict(X_test)),
+            "train_rows": len(X_train),
+            "test_rows": len(X_test)
+        }
+    }
 
-print("✅ Diabetes model saved!")
+# Each stage is reused from .build_cache unless its inputs, code or libraries changed
+cache = BuildCache("diabetes")
+raw = cache.stage("load", load_data, cache.file("diabetes.csv"))
+encoded = cache.stage("encode", encode, raw, label_cols=LABEL_COLS)
+imputed = cache.stage("impute", impute, encoded)
+splits = cache.stage("split", split, imputed, test_size=0.2, random_state=42)
+model = cache.stage("fit", fit, splits, random_state=42, class_weight="balanced")
+bundle = cache.stage("package", package, encoded, imputed, splits, model).value
+cache.report()
 
-joblib.dump(X.columns, "models/diabetes_features.pkl")
+# Publish model + encoders + imputer + features as a new registry version
+version = publish_bundle("diabetes", bundle["artifacts"], features=bundle["features"], metrics=bundle["metrics"])
 
-print("✅ Diabetes model saved!")
+print(f"✅ Diabetes model published as version {version} (accuracy {bundle['metrics']['accuracy']:.3f})!")
@@ -1,9 +1,10 @@
-import os
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 from sklearn.ensemble import RandomForestClassifier
-import joblib
+from sklearn.metrics import accuracy_score
+from build_cache import BuildCache
+from model_registry import publish_bundle
 
 
 # ---------------------------
@@ -15,52 +16,85 @@ def get_input_float(label):
 def get_input_int(label):
     return int(st.text_input(label, "0"))
 
-# ---------------------------
-# Ensure models folder exists
-# ---------------------------
-os.makedirs("models", exist_ok=True)
-
 # ---------------------------
 # Load dataset
 # ---------------------------
-df = pd.read_csv("bp.csv")
+def load_data(path):
+    df = pd.read_csv(path)
 
-# Drop Patient_Number column
-if "Patient_Number" in df.columns:
-    df = df.drop(columns=["Patient_Number"])
+    # Drop Patient_Number column
+    if "Patient_Number" in df.columns:
+        df = df.drop(columns=["Patient_Number"])
+    return df
 
 # Handle missing values
-for col in df.columns:
-    if df[col].dtype == 'object':
-        df[col] = df[col].fillna(df[col].mode()[0])
-    else:
-        df[col] = df[col].fillna(df[col].mean())
-
-# Features & target
-X = df.drop(columns=["Blood_Pressure_Abnormality"])
-y = df["Blood_Pressure_Abnormality"]
-
-# One-hot encode categorical columns
-X = pd.get_dummies(X, drop_first=True)
+def impute(df):
+    df = df.copy()
+    for col in df.columns:
+        if df[col].dtype == 'object':
+            df[col] = df[col].fillna(df[col].mode()[0])
+        else:
+            df[col] = df[col].fillna(df[col].mean())
+    return df
 
-# Save feature names for later
-feature_cols = X.columns
+# Features & target, one-hot encode categorical columns
+def build_features(df):
+    X = df.drop(columns=["Blood_Pressure_Abnormality"])
+    y = df["Blood_Pressure_Abnormality"]
+    X = pd.get_dummies(X, drop_first=True)
+    return X, y
 
 # Split dataset
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+def split(features, test_size, random_state):
+    X, y = features
+    return train_test_split(X, y, test_size=test_size, random_state=random_state)
 
 # Scale numeric features
-scaler = StandardScaler()
-X_train_scaled = scaler.fit_transform(X_train)
-X_test_scaled = scaler.transform(X_test)
+def scale(splits):
+    X_train, X_test, _, _ = splits
+    scaler = StandardScaler()
+    X_train_scaled = scaler.fit_transform(X_train)
+    X_test_scaled = scaler.transform(X_test)
+    return scaler, X_train_scaled, X_test_scaled
 
 # Train Random Forest Classifier
-model = RandomForestClassifier(random_state=42)
-model.fit(X_train_scaled, y_train)
+def fit(splits, scaled, **hyperparams):
+    _, _, y_train, _ = splits
+    _, X_train_scaled, _ = scaled
+    model = RandomForestClassifier(**hyperparams)
+    model.fit(X_train_scaled, y_train)
+    return model
+
+# Evaluate and collect everything the app needs
+def package(features, splits, scaled, model):
+    X, _ = features
+    X_train, X_test, _, y_test = splits
+    scaler, _, X_test_scaled = scaled
+    return {
+        "artifacts": {"model": model, "scaler": scaler, "features": X.columns},
+        "features": list(X.columns),
+        "metrics": {
+            "accuracy": accuracy_score(y_test, model.predict(X_test_scaled)),
+            "train_rows": len(X_train),
+            "test_rows": len(X_test)
+        }
+    }
+
+# ---------------------------
+# Run pipeline, reusing unchanged stages from .build_cache
+# ---------------------------
+cache = BuildCache("bp")
+raw = cache.stage("load", load_data, cache.file("bp.csv"))
+imputed = cache.stage("impute", impute, raw)
+features = cache.stage("features", build_features, imputed)
+splits = cache.stage("split", split, features, test_size=0.2, random_state=42)
+scaled = cache.stage("scale", scale, splits)
+model = cache.stage("fit", fit, splits, scaled, random_state=42)
+bundle = cache.stage("package", package, features, splits, scaled, model).value
+cache.report()
 
-# --- Save model, scaler, and feature columns ---
-joblib.dump(model, "models/bp_model.pkl")
-joblib.dump(scaler, "models/bp_scaler.pkl")
-joblib.dump(feature_cols, "models/bp_features.pkl")
+# --- Publish model, scaler, and feature columns as a new registry version ---
+version = publish_bundle("bp", bundle["artifacts"], features=bundle["features"], metrics=bundle["metrics"])
 
-print("✅ BP model, scaler, and feature columns saved!")
\ No newline at end of file
+print(f"✅ BP model, scaler, and feature columns published as version {version} "
+      f"(accuracy {bundle['metrics']['accuracy']:.3f})!")
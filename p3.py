@@ -1,66 +1,105 @@
-import os
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 from sklearn.linear_model import LogisticRegression
 from sklearn.ensemble import RandomForestClassifier
-import joblib
+from sklearn.metrics import accuracy_score
+from build_cache import BuildCache
+from model_registry import publish_bundle
 
-# Ensure models folder exists
-os.makedirs("models", exist_ok=True)
-
-# Load dataset
-df = pd.read_csv("lungcancer.csv")
-
-# Drop unused columns
-drop_cols = [
+# Unused columns
+DROP_COLS = [
     "index", "Patient Id", "Air Pollution", "OccuPational Hazards",
     "Balanced Diet", "Obesity", "Passive Smoker",
     "Clubbing of Finger Nails", "Frequent Cold",
     "Dry Cough", "Snoring"
 ]
-df = df.drop(columns=[col for col in drop_cols if col in df.columns])
 
-# Handle missing values: numeric -> mean, categorical -> mode
-for col in df.columns:
-    if df[col].dtype == 'object':
-        df[col] = df[col].fillna(df[col].mode()[0])
-    else:
-        df[col] = df[col].fillna(df[col].mean())
+# Load dataset
+def load_data(path):
+    return pd.read_csv(path)
 
-# Features & Target
-X = df.drop(columns=["Level"])
-y = df["Level"]
+# Drop unused columns
+def drop_columns(df, drop_cols):
+    return df.drop(columns=[col for col in drop_cols if col in df.columns])
+
+# Handle missing values: numeric -> mean, categorical -> mode
+def impute(df):
+    df = df.copy()
+    for col in df.columns:
+        if df[col].dtype == 'object':
+            df[col] = df[col].fillna(df[col].mode()[0])
+        else:
+            df[col] = df[col].fillna(df[col].mean())
+    return df
 
-# One-hot encode categorical columns
-X = pd.get_dummies(X, drop_first=True)
+# Features & Target, one-hot encode categorical columns
+def build_features(df):
+    X = df.drop(columns=["Level"])
+    y = df["Level"]
+    X = pd.get_dummies(X, drop_first=True)
 
-# Check if any NaNs remain
-if X.isna().sum().sum() > 0:
-    raise ValueError("NaNs still present in features!")
+    # Check if any NaNs remain
+    if X.isna().sum().sum() > 0:
+        raise ValueError("NaNs still present in features!")
+    return X, y
 
 # Split dataset
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y, test_size=0.2, random_state=42
-)
+def split(features, test_size, random_state):
+    X, y = features
+    return train_test_split(X, y, test_size=test_size, random_state=random_state)
 
 # Scale features
-scaler = StandardScaler()
-X_train_scaled = scaler.fit_transform(X_train)
-X_test_scaled = scaler.transform(X_test)
+def scale(splits):
+    X_train, X_test, _, _ = splits
+    scaler = StandardScaler()
+    X_train_scaled = scaler.fit_transform(X_train)
+    X_test_scaled = scaler.transform(X_test)
+    return scaler, X_train_scaled, X_test_scaled
 
 # Train Random Forest
-rf = RandomForestClassifier(random_state=42)
-rf.fit(X_train_scaled, y_train)
+def fit_rf(splits, scaled, **hyperparams):
+    rf = RandomForestClassifier(**hyperparams)
+    rf.fit(scaled[1], splits[2])
+    return rf
 
 # Train Logistic Regression (optional)
-log_reg = LogisticRegression(max_iter=500)
-log_reg.fit(X_train_scaled, y_train)
+def fit_log_reg(splits, scaled, **hyperparams):
+    log_reg = LogisticRegression(**hyperparams)
+    log_reg.fit(scaled[1], splits[2])
+    return log_reg
+
+# Evaluate and collect everything the app needs
+def package(features, splits, scaled, rf, log_reg):
+    X, _ = features
+    X_train, X_test, _, y_test = splits
+    scaler, _, X_test_scaled = scaled
+    return {
+        "artifacts": {"rf_model": rf, "logreg_model": log_reg, "scaler": scaler, "features": X.columns},
+        "features": list(X.columns),
+        "metrics": {
+            "rf_accuracy": accuracy_score(y_test, rf.predict(X_test_scaled)),
+            "logreg_accuracy": accuracy_score(y_test, log_reg.predict(X_test_scaled)),
+            "train_rows": len(X_train),
+            "test_rows": len(X_test)
+        }
+    }
+
+# Each stage is reused from .build_cache unless its inputs, code or libraries changed
+cache = BuildCache("lungcancer")
+raw = cache.stage("load", load_data, cache.file("lungcancer.csv"))
+selected = cache.stage("drop", drop_columns, raw, drop_cols=DROP_COLS)
+imputed = cache.stage("impute", impute, selected)
+features = cache.stage("features", build_features, imputed)
+splits = cache.stage("split", split, features, test_size=0.2, random_state=42)
+scaled = cache.stage("scale", scale, splits)
+rf = cache.stage("fit_rf", fit_rf, splits, scaled, random_state=42)
+log_reg = cache.stage("fit_logreg", fit_log_reg, splits, scaled, max_iter=500)
+bundle = cache.stage("package", package, features, splits, scaled, rf, log_reg).value
+cache.report()
 
-# --- Save models, scaler, and feature columns ---
-joblib.dump(rf, "models/lungcancer_rf_model.pkl")
-joblib.dump(log_reg, "models/lungcancer_logreg_model.pkl")
-joblib.dump(scaler, "models/lungcancer_scaler.pkl")
-joblib.dump(X.columns, "models/lungcancer_features.pkl")
+# --- Publish models, scaler, and feature columns as a new registry version ---
+version = publish_bundle("lungcancer", bundle["artifacts"], features=bundle["features"], metrics=bundle["metrics"])
 
-print("✅ Lung cancer models, scaler, and feature columns saved in 'models/' folder!")
+print(f"✅ Lung cancer models, scaler, and feature columns published as version {version} "
+      f"(RF accuracy {bundle['metrics']['rf_accuracy']:.3f})!")
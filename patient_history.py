@@ -1,10 +1,38 @@
 # patient_history.py
+import csv
+import gzip
+import os
+import re
+import sys
+import uuid
 import psycopg2
-from datetime import datetime
+from datetime import date, datetime, timedelta
 import streamlit as st
 
-# 🔗 Database connection
+# Rows pulled per round trip when streaming exports from the server-side cursor
+EXPORT_CHUNK_SIZE = 5000
+# Exports are written here on the server; only files up to the size below are offered for browser download
+EXPORT_DIR = "exports"
+EXPORT_DOWNLOAD_MAX_BYTES = 50 * 1024 ** 2
+# Large exports left in EXPORT_DIR for collection are deleted after this many hours
+EXPORT_RETENTION_HOURS = 24
+EXPORT_COLUMNS = [
+    "id", "user_id", "patient_id", "patient_name", "age", "gender", "symptoms",
+    "disease", "diagnosis_result", "confidence_score", "created_at"
+]
+
+# patient_records is range-partitioned by month on created_at
+PARTITION_MONTHS_AHEAD = 3
+RETENTION_MONTHS = 24
+ARCHIVE_DIR = "archive"
+# The history panel only looks this many months back, so it scans the newest partitions only
+RECENT_HISTORY_MONTHS = 3
+
+# 🔗 Database connection (MEDICAL_AI_DSN points the app at another database, e.g. for load tests)
 def get_connection():
+    dsn = os.environ.get("MEDICAL_AI_DSN")
+    if dsn:
+        return psycopg2.connect(dsn)
     return psycopg2.connect(
         host="localhost",
         database="medical_ai",
@@ -13,14 +41,90 @@ def get_connection():
         port=5432
     )
 
-# 🏗️ Initialize the table (run once during app startup)
-def init_patient_table():
+# 📅 First day of the month `offset` months away from `day`
+def _month_start(day, offset=0):
+    month = day.year * 12 + day.month - 1 + offset
+    return date(month // 12, month % 12 + 1, 1)
+
+def _partition_name(month):
+    return f"patient_records_y{month.year}m{month.month:02d}"
+
+# Serializes partition DDL across app processes, maintenance runs and the migration
+PARTITION_LOCK_ID = 4207331
+DEFAULT_PARTITION = "patient_records_default"
+
+def _relkind(cur, name):
+    cur.execute("""
+        SELECT c.relkind FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE c.relname = %s AND n.nspname = current_schema()
+    """, (name,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+# 🧱 Create monthly partitions from `first_month` through PARTITION_MONTHS_AHEAD months from now.
+# Returns False while patient_records is still the unpartitioned legacy table.
+def ensure_partitions(cur, first_month=None):
+    cur.execute("SELECT pg_advisory_xact_lock(%s)", (PARTITION_LOCK_ID,))
+    if _relkind(cur, "patient_records") != "p":
+        return False
+    columns = ", ".join(EXPORT_COLUMNS)
+    months = []
+    month = first_month or _month_start(date.today())
+    while month <= _month_start(date.today(), PARTITION_MONTHS_AHEAD):
+        months.append(month)
+        month = _month_start(month, 1)
+    for lower in months:
+        name, upper = _partition_name(lower), _month_start(lower, 1)
+        cur.execute("SELECT to_regclass(%s)", (name,))
+        if cur.fetchone()[0] is not None:
+            continue
+        cur.execute(f"LOCK TABLE {DEFAULT_PARTITION} IN EXCLUSIVE MODE")
+        cur.execute(f"""
+            SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE created_at >= %s AND created_at < %s)
+        """, (lower, upper))
+        if not cur.fetchone()[0]:
+            cur.execute(f"""
+                CREATE TABLE {name} PARTITION OF patient_records
+                FOR VALUES FROM (%s) TO (%s)
+            """, (lower, upper))
+            continue
+        # Rows for this month landed in the DEFAULT partition (maintenance fell behind):
+        # move them into a new table, then attach it as the month's partition
+        cur.execute(f"CREATE TABLE {name} (LIKE patient_records INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+        cur.execute(f"""
+            WITH moved AS (
+                DELETE FROM {DEFAULT_PARTITION} WHERE created_at >= %s AND created_at < %s
+                RETURNING {columns}
+            )
+            INSERT INTO {name} ({columns}) SELECT {columns} FROM moved
+        """, (lower, upper))
+        cur.execute(f"""
+            ALTER TABLE patient_records ATTACH PARTITION {name}
+            FOR VALUES FROM (%s) TO (%s)
+        """, (lower, upper))
+    return True
+
+# 📆 Keep partitions current from inside the app; runs once per process per month
+@st.cache_resource(show_spinner=False)
+def _partitions_ready(month):
     conn = get_connection()
     cur = conn.cursor()
+    try:
+        ensure_partitions(cur)
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+    return True
+
+def _create_partitioned_table(cur):
+    # The partition key has to be part of the primary key
     cur.execute("""
         CREATE TABLE IF NOT EXISTS patient_records (
-            id SERIAL PRIMARY KEY,
+            id SERIAL,
             user_id INTEGER REFERENCES users(id),
+            patient_id INTEGER REFERENCES patients(id),
             patient_name VARCHAR(100),
             age INTEGER,
             gender VARCHAR(10),
@@ -28,24 +132,282 @@ def init_patient_table():
             disease VARCHAR(50),
             diagnosis_result VARCHAR(50),
             confidence_score FLOAT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
     """)
+    # Catches rows outside every monthly partition, so inserts never fail on a missing month
+    cur.execute(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF patient_records DEFAULT")
+
+def _create_record_indexes(cur):
+    # Defined on the parent, so every partition gets its own copy
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_patient_records_user_created
+        ON patient_records (user_id, created_at DESC)
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_patient_records_patient_created
+        ON patient_records (patient_id, created_at DESC)
+    """)
+    # Time-range scans: the analytics refresh window, export date filters and ordering
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_patient_records_created
+        ON patient_records (created_at)
+    """)
+
+# 🏗️ Initialize the table (run once during app startup)
+def init_patient_table():
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT pg_advisory_xact_lock(%s)", (PARTITION_LOCK_ID,))
+    if _relkind(cur, "patient_records") == "r":
+        # Pre-partitioning table: keep serving it until an operator runs the migration,
+        # which rewrites the whole table and must not race app startup
+        cur.execute("""
+            ALTER TABLE patient_records
+            ADD COLUMN IF NOT EXISTS patient_id INTEGER REFERENCES patients(id)
+        """)
+        _create_record_indexes(cur)
+        print("⚠️ patient_records is not partitioned yet; run `python patient_history.py migrate` "
+              "during a maintenance window.", file=sys.stderr)
+    else:
+        _create_partitioned_table(cur)
+        ensure_partitions(cur)
+        _create_record_indexes(cur)
     conn.commit()
     cur.close()
     conn.close()
 
+# 🚚 One-off migration of the legacy unpartitioned table (python patient_history.py migrate).
+# Holds an exclusive lock on patient_records while it copies, so run it with the app stopped.
+def migrate_to_partitions():
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT pg_advisory_xact_lock(%s)", (PARTITION_LOCK_ID,))
+        # Re-check under the lock: another run may have migrated already
+        if _relkind(cur, "patient_records") != "r":
+            conn.rollback()
+            return False
+        cur.execute("LOCK TABLE patient_records IN ACCESS EXCLUSIVE MODE")
+
+        # Move the heap aside, freeing its index, constraint and sequence names
+        cur.execute("ALTER TABLE patient_records ADD COLUMN IF NOT EXISTS patient_id INTEGER")
+        cur.execute("DROP INDEX IF EXISTS idx_patient_records_user_created")
+        cur.execute("DROP INDEX IF EXISTS idx_patient_records_patient_created")
+        cur.execute("DROP INDEX IF EXISTS idx_patient_records_created")
+        cur.execute("ALTER TABLE patient_records RENAME TO patient_records_legacy")
+        cur.execute("ALTER TABLE patient_records_legacy RENAME CONSTRAINT patient_records_pkey TO patient_records_legacy_pkey")
+        cur.execute("ALTER SEQUENCE patient_records_id_seq RENAME TO patient_records_legacy_id_seq")
+
+        _create_partitioned_table(cur)
+        cur.execute("SELECT min(created_at) FROM patient_records_legacy")
+        oldest = cur.fetchone()[0]
+        first_month = _month_start(min(oldest.date(), date.today())) if oldest else None
+        ensure_partitions(cur, first_month)
+
+        cur.execute("""
+            INSERT INTO patient_records (
+                id, user_id, patient_id, patient_name, age, gender, symptoms,
+                disease, diagnosis_result, confidence_score, created_at
+            )
+            SELECT id, user_id, patient_id, patient_name, age, gender, symptoms,
+                   disease, diagnosis_result, confidence_score, COALESCE(created_at, CURRENT_TIMESTAMP)
+            FROM patient_records_legacy
+        """)
+        cur.execute("""
+            SELECT setval(pg_get_serial_sequence('patient_records', 'id'),
+                          COALESCE((SELECT max(id) FROM patient_records), 0) + 1, false)
+        """)
+        cur.execute("DROP TABLE patient_records_legacy")
+        _create_record_indexes(cur)
+        conn.commit()
+        return True
+    finally:
+        cur.close()
+        conn.close()
+
+# 🗄️ Archive partitions older than `retention_months` to gzipped CSV, then drop them
+def apply_retention(retention_months=RETENTION_MONTHS, archive_dir=ARCHIVE_DIR):
+    cutoff = _month_start(date.today(), -retention_months)
+    os.makedirs(archive_dir, exist_ok=True)
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'patient_records'::regclass
+        ORDER BY c.relname
+    """)
+    archived = []
+    for (name,) in cur.fetchall():
+        # Only monthly partitions age out; the DEFAULT partition is never archived
+        match = re.fullmatch(r"patient_records_y(\d{4})m(\d{2})", name)
+        if not match:
+            continue
+        month = date(int(match.group(1)), int(match.group(2)), 1)
+        if _month_start(month, 1) > cutoff:
+            continue
+
+        # Old partitions no longer receive writes, so copy first and only
+        # detach + drop once the archive is safely on disk.
+        path = os.path.join(archive_dir, f"{name}.csv.gz")
+        tmp_path = path + ".tmp"
+        with gzip.open(tmp_path, "wb") as f:
+            cur.copy_expert(f"COPY {name} TO STDOUT WITH (FORMAT csv, HEADER)", f)
+        with open(tmp_path, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+        cur.execute(f"ALTER TABLE patient_records DETACH PARTITION {name}")
+        cur.execute(f"DROP TABLE {name}")
+        conn.commit()
+        archived.append(path)
+    conn.rollback()
+    cur.close()
+    conn.close()
+    return archived
+
+# 🔧 Periodic maintenance: upcoming partitions + retention (run from cron; the app also adds them monthly)
+def maintain_partitions():
+    conn = get_connection()
+    cur = conn.cursor()
+    ensure_partitions(cur)
+    conn.commit()
+    cur.close()
+    conn.close()
+    return apply_retention()
+
+# ☎️ Phone numbers are matched on digits only, so "+1 (555) 010-2030" == "15550102030"
+def normalize_phone(phone):
+    digits = re.sub(r"\D", "", phone or "")
+    return digits or None
+
+# 🗂️ Save a patient to the registry, returns (True, patient_id) or (False, error message)
+# A selected returning patient is updated in place; otherwise insert, merging on phone
+def upsert_patient(user_id, first_name, last_name, phone, age=None, gender=None, patient_id=None):
+    phone = phone.strip() if phone else None
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        if patient_id is not None:
+            # A blank phone keeps the one on file instead of clearing it
+            cur.execute("""
+                UPDATE patients SET
+                    first_name = %s,
+                    last_name = %s,
+                    phone = COALESCE(%s, phone),
+                    phone_normalized = COALESCE(%s, phone_normalized),
+                    age = COALESCE(%s, age),
+                    gender = COALESCE(%s, gender)
+                WHERE id = %s
+                RETURNING id
+            """, (first_name.strip(), last_name.strip(), phone, normalize_phone(phone), age, gender, patient_id))
+        else:
+            cur.execute("""
+                INSERT INTO patients (user_id, first_name, last_name, phone, phone_normalized, age, gender)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                ON CONFLICT (phone_normalized) DO UPDATE SET
+                    first_name = EXCLUDED.first_name,
+                    last_name = EXCLUDED.last_name,
+                    phone = EXCLUDED.phone,
+                    age = COALESCE(EXCLUDED.age, patients.age),
+                    gender = COALESCE(EXCLUDED.gender, patients.gender)
+                RETURNING id
+            """, (user_id, first_name.strip(), last_name.strip(), phone, normalize_phone(phone), age, gender))
+        row = cur.fetchone()
+        if row is None:
+            conn.rollback()
+            return False, "❌ Error saving patient: the selected patient no longer exists."
+        conn.commit()
+        search_patients.clear()
+        return True, row[0]
+    except Exception as e:
+        return False, f"❌ Error saving patient: {e}"
+    finally:
+        if 'cur' in locals():
+            cur.close()
+        if 'conn' in locals():
+            conn.close()
+
+# LIKE wildcards typed by the user are matched literally
+def _like_prefix(text):
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+# 🔎 Prefix search on phone digits or name, cached for search-as-you-type.
+# With a user_id only that clinician's patients are searched (registered by them or
+# diagnosed by them); user_id=None searches the whole registry and is for auditors.
+@st.cache_data(ttl=300, max_entries=1000, show_spinner=False)
+def search_patients(query, user_id=None, limit=10):
+    query = (query or "").strip().lower()
+    if not query:
+        return []
+
+    if re.fullmatch(r"[\d\s()+\-.]+", query):
+        digits = normalize_phone(query)
+        if not digits:
+            return []
+        where, params = "phone_normalized LIKE %s", [_like_prefix(digits)]
+    else:
+        parts = query.split()
+        if len(parts) > 1:
+            # "john sm" -> first name starts with "john" and last name with "sm"
+            where = "lower(first_name) LIKE %s AND lower(last_name) LIKE %s"
+            params = [_like_prefix(parts[0]), _like_prefix(" ".join(parts[1:]))]
+        else:
+            where = "(lower(first_name) LIKE %s OR lower(last_name) LIKE %s)"
+            params = [_like_prefix(parts[0]), _like_prefix(parts[0])]
+    if user_id is not None:
+        where += """ AND (p.user_id = %s OR EXISTS (
+            SELECT 1 FROM patient_records r WHERE r.patient_id = p.id AND r.user_id = %s
+        ))"""
+        params += [user_id, user_id]
+
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(f"""
+        SELECT p.id, p.first_name, p.last_name, p.phone, p.age, p.gender
+        FROM patients p
+        WHERE {where}
+        ORDER BY last_name, first_name
+        LIMIT %s
+    """, params + [limit])
+    rows = cur.fetchall()
+    cur.close()
+    conn.close()
+    return rows
+
+# 📜 Diagnoses for one registered patient (newest first), limited to one clinician's
+# records unless user_id is None (auditors)
+@st.cache_data(ttl=300, show_spinner=False)
+def get_patient_history(patient_id, user_id=None, limit=50):
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT patient_name, age, gender, symptoms, disease, diagnosis_result, confidence_score, created_at
+        FROM patient_records
+        WHERE patient_id = %s AND (%s IS NULL OR user_id = %s)
+        ORDER BY created_at DESC
+        LIMIT %s
+    """, (patient_id, user_id, user_id, limit))
+    rows = cur.fetchall()
+    cur.close()
+    conn.close()
+    return rows
+
 # 💾 Save patient details & diagnosis result
-def save_patient_record(user_id, patient_data, disease, result, confidence):
+def save_patient_record(user_id, patient_data, disease, result, confidence, patient_id=None):
     try:
+        _partitions_ready(_month_start(date.today()))
         conn = get_connection()
         cur = conn.cursor()
         cur.execute("""
             INSERT INTO patient_records (
-                user_id, patient_name, age, gender, symptoms, disease, diagnosis_result, confidence_score
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                user_id, patient_id, patient_name, age, gender, symptoms, disease, diagnosis_result, confidence_score
+            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
         """, (
             user_id,
+            patient_id,
             patient_data.get("Name", "Unknown"),
             patient_data.get("Age", 0),
             patient_data.get("Sex", "Unknown"),
@@ -55,41 +417,258 @@ def save_patient_record(user_id, patient_data, disease, result, confidence):
             confidence
         ))
         conn.commit()
-        st.success("📦 Patient record saved successfully.")
+        get_patient_records.clear()
+        get_patient_history.clear()
+        return True, "📦 Patient record saved successfully."
     except Exception as e:
-        st.error(f"❌ Error saving patient record: {e}")
+        return False, f"❌ Error saving patient record: {e}"
     finally:
         if 'cur' in locals():
             cur.close()
         if 'conn' in locals():
             conn.close()
 
-# 📜 Fetch recent records for the current user
-def get_patient_records(user_id, limit=5):
+# 📜 Fetch recent records for the current user (cached until the next save)
+@st.cache_data(ttl=300, show_spinner=False)
+def get_patient_records(user_id, limit=5, months=RECENT_HISTORY_MONTHS):
     conn = get_connection()
     cur = conn.cursor()
+    # A literal lower bound on created_at lets the planner prune older partitions
     cur.execute("""
         SELECT patient_name, age, gender, symptoms, disease, diagnosis_result, confidence_score, created_at
         FROM patient_records
-        WHERE user_id = %s
+        WHERE user_id = %s AND created_at >= %s
         ORDER BY created_at DESC
         LIMIT %s
-    """, (user_id, limit))
+    """, (user_id, _month_start(date.today(), 1 - months), limit))
     rows = cur.fetchall()
     cur.close()
     conn.close()
     return rows
 
 # 🧾 Display records inside Streamlit
+@st.fragment
 def display_patient_records(user_id):
     st.markdown("### 📋 Previous Patient Records")
     records = get_patient_records(user_id)
     if records:
-        for r in records:
-            st.write(f"🧍 **{r[0]}**, {r[1]} yrs, {r[2]}")
-            st.write(f"💬 Symptoms: {r[3]}")
-            st.write(f"🦠 Disease: {r[4]} | 🩺 Result: {r[5]} ({r[6]:.1f}% confidence)")
-            st.write(f"🕒 Date: {r[7]}")
-            st.markdown("---")
+        st.dataframe(
+            [{
+                "Patient": r[0],
+                "Age": r[1],
+                "Gender": r[2],
+                "Symptoms": r[3],
+                "Disease": r[4],
+                "Result": r[5],
+                "Confidence (%)": round(r[6], 1) if r[6] is not None else None,
+                "Date": r[7]
+            } for r in records],
+            hide_index=True,
+            width="stretch"
+        )
     else:
         st.info("No previous records found.")
+
+# 📤 Build the filtered export query (all filters optional)
+def _build_export_query(user_id=None, disease=None, start_date=None, end_date=None):
+    clauses, params = [], []
+    if user_id is not None:
+        clauses.append("user_id = %s")
+        params.append(user_id)
+    if disease:
+        clauses.append("disease = %s")
+        params.append(disease)
+    if start_date:
+        clauses.append("created_at >= %s")
+        params.append(start_date)
+    if end_date:
+        # end_date is inclusive of the whole day
+        clauses.append("created_at < %s")
+        params.append(end_date + timedelta(days=1))
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    sql = f"""
+        SELECT {', '.join(EXPORT_COLUMNS)}
+        FROM patient_records
+        {where}
+        ORDER BY created_at, id
+    """
+    return sql, params
+
+# 🌊 Stream matching records in chunks from a named (server-side) cursor
+def iter_patient_record_chunks(user_id=None, disease=None, start_date=None, end_date=None,
+                               chunk_size=EXPORT_CHUNK_SIZE):
+    sql, params = _build_export_query(user_id, disease, start_date, end_date)
+    conn = get_connection()
+    # A named cursor keeps the result set on the server; only chunk_size rows
+    # are held in this process at a time.
+    cur = conn.cursor(name=f"patient_export_{uuid.uuid4().hex}")
+    cur.itersize = chunk_size
+    try:
+        cur.execute(sql, params)
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        cur.close()
+        conn.rollback()
+        conn.close()
+
+def _write_csv(path, chunks):
+    total = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(EXPORT_COLUMNS)
+        for rows in chunks:
+            writer.writerows(rows)
+            total += len(rows)
+    return total
+
+def _write_parquet(path, chunks):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export requires the 'pyarrow' package.")
+
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("user_id", pa.int64()),
+        ("patient_id", pa.int64()),
+        ("patient_name", pa.string()),
+        ("age", pa.int64()),
+        ("gender", pa.string()),
+        ("symptoms", pa.string()),
+        ("disease", pa.string()),
+        ("diagnosis_result", pa.string()),
+        ("confidence_score", pa.float64()),
+        ("created_at", pa.timestamp("us")),
+    ])
+    total = 0
+    # Each chunk becomes its own row group, so memory stays bounded by chunk_size
+    with pq.ParquetWriter(path, schema, compression="snappy") as writer:
+        for rows in chunks:
+            columns = list(zip(*rows))
+            arrays = [pa.array(col, type=field.type) for col, field in zip(columns, schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            total += len(rows)
+    if total == 0:
+        pq.write_table(schema.empty_table(), path)
+    return total
+
+# 💽 Export records to a CSV or Parquet file, returns the number of rows written
+def export_patient_records(path, fmt="csv", user_id=None, disease=None, start_date=None,
+                           end_date=None, chunk_size=EXPORT_CHUNK_SIZE):
+    chunks = iter_patient_record_chunks(user_id, disease, start_date, end_date, chunk_size)
+    if fmt == "csv":
+        return _write_csv(path, chunks)
+    elif fmt == "parquet":
+        return _write_parquet(path, chunks)
+    raise ValueError(f"Unsupported export format: {fmt}")
+
+# 🔐 Only these accounts may export every clinician's records (comma-separated emails)
+def can_export_all_users(email):
+    allowed = os.environ.get("MEDICAL_AI_AUDITORS", "")
+    return (email or "").lower() in {e.strip().lower() for e in allowed.split(",") if e.strip()}
+
+# 🧹 Delete exports older than `max_age_hours` from the server, returns the removed paths
+def cleanup_exports(max_age_hours=EXPORT_RETENTION_HOURS, export_dir=EXPORT_DIR):
+    if not os.path.isdir(export_dir):
+        return []
+    cutoff = datetime.now().timestamp() - max_age_hours * 3600
+    removed = []
+    for name in os.listdir(export_dir):
+        path = os.path.join(export_dir, name)
+        if os.path.isfile(path) and os.path.getmtime(path) < cutoff:
+            os.remove(path)
+            removed.append(path)
+    return removed
+
+# 👥 Clinicians an auditor can export for
+@st.cache_data(ttl=300, show_spinner=False)
+def list_clinicians():
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT id, name, email FROM users ORDER BY name, id")
+    rows = cur.fetchall()
+    cur.close()
+    conn.close()
+    return rows
+
+# 📤 Export panel inside Streamlit
+@st.fragment
+def display_export_panel(user_id, allow_all_users=False):
+    with st.expander("📤 Export Patient Records"):
+        fmt = st.selectbox("Format", ["csv", "parquet"], key="export_fmt")
+        export_user = user_id
+        if allow_all_users:
+            # None exports every clinician's records
+            clinicians = {uid: f"{name} ({email})" for uid, name, email in list_clinicians()}
+            export_user = st.selectbox(
+                "Clinician",
+                [user_id, None] + [uid for uid in clinicians if uid != user_id],
+                format_func=lambda uid: "My records" if uid == user_id else
+                                        "All users" if uid is None else clinicians[uid],
+                key="export_user"
+            )
+        disease = st.selectbox("Disease", ["All", "Diabetes", "Blood Pressure Abnormality", "Lung Cancer"],
+                               key="export_disease")
+        col1, col2 = st.columns(2)
+        with col1:
+            start_date = st.date_input("From", value=None, key="export_start")
+        with col2:
+            end_date = st.date_input("To", value=None, key="export_end")
+
+        if st.button("Prepare Export", key="export_btn"):
+            cleanup_exports()
+            os.makedirs(EXPORT_DIR, exist_ok=True)
+            path = os.path.join(EXPORT_DIR, f"patient_records_{datetime.now():%Y%m%d_%H%M%S}_{uuid.uuid4().hex[:6]}.{fmt}")
+            try:
+                count = export_patient_records(
+                    path,
+                    fmt=fmt,
+                    user_id=export_user,
+                    disease=None if disease == "All" else disease,
+                    start_date=start_date,
+                    end_date=end_date
+                )
+            except Exception as e:
+                if os.path.exists(path):
+                    os.remove(path)
+                st.error(f"❌ Export failed: {e}")
+                return
+            # download_button holds the whole file in memory, so it is only offered for
+            # small exports and only in this run; the file is deleted once read, leaving no
+            # patient data on the server. Larger audits are collected from EXPORT_DIR.
+            if os.path.getsize(path) <= EXPORT_DOWNLOAD_MAX_BYTES:
+                with open(path, "rb") as f:
+                    data = f.read()
+                os.remove(path)
+                st.success(f"✅ Exported {count} records")
+                st.download_button(
+                    "⬇️ Download",
+                    data=data,
+                    file_name=os.path.basename(path),
+                    mime="text/csv" if fmt == "csv" else "application/octet-stream",
+                    on_click="ignore",
+                    key="export_download"
+                )
+            else:
+                st.success(f"✅ Exported {count} records to {os.path.abspath(path)}")
+                st.info(f"ℹ️ Export is too large to download in the browser; collect it from the server path "
+                        f"above within {EXPORT_RETENTION_HOURS} hours, after which it is deleted.")
+
+if __name__ == "__main__":
+    # python patient_history.py [migrate]
+    if sys.argv[1:] == ["migrate"]:
+        if migrate_to_partitions():
+            print("✅ patient_records migrated to monthly partitions.")
+        else:
+            print("✅ patient_records is already partitioned.")
+        sys.exit(0)
+    for path in maintain_partitions():
+        print(f"🗄️ Archived {path}")
+    for path in cleanup_exports():
+        print(f"🧹 Removed expired export {path}")
+    print("✅ Partition maintenance done.")
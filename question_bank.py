@@ -0,0 +1,143 @@
+# question_bank.py
+import heapq
+import json
+import random
+from collections import defaultdict
+import streamlit as st
+from psycopg2.extras import execute_values
+from patient_history import get_connection
+
+QUESTIONS_FILE = "quiz_questions.json"
+QUIZ_LENGTH = 10
+# Pending answers are written to the database once this many have piled up (and always
+# on a quiz's last answer), so a closed tab loses at most ANSWER_BATCH_SIZE - 1 answers
+ANSWER_BATCH_SIZE = 3
+UNSEEN_WEIGHT = 3.0
+DIFFICULTY_LABELS = {1: "Easy", 2: "Medium", 3: "Hard"}
+
+
+class QuestionBank:
+    """In-memory question bank indexed by (disease, topic, difficulty).
+
+    Topic and difficulty may be None to mean "any", so every filter
+    combination is a single dict lookup.
+    """
+
+    def __init__(self, questions):
+        self.by_id = {}
+        self._index = defaultdict(list)
+        self._topics = defaultdict(set)
+        for q in questions:
+            if q["id"] in self.by_id:
+                raise ValueError(f"Duplicate question id {q['id']}")
+            if q["answer"] not in q["options"]:
+                raise ValueError(f"Question {q['id']}: answer is not one of the options")
+            self.by_id[q["id"]] = q
+            self._topics[q["disease"]].add(q["topic"])
+            for topic in (None, q["topic"]):
+                for difficulty in (None, q["difficulty"]):
+                    self._index[(q["disease"], topic, difficulty)].append(q["id"])
+
+    def diseases(self):
+        return sorted(self._topics)
+
+    def topics(self, disease):
+        return sorted(self._topics.get(disease, ()))
+
+    def question_ids(self, disease, topic=None, difficulty=None):
+        return self._index.get((disease, topic, difficulty), [])
+
+
+# 📚 Loaded once per process and shared by all sessions
+@st.cache_resource
+def get_question_bank(path=QUESTIONS_FILE):
+    with open(path, encoding="utf-8") as f:
+        return QuestionBank(json.load(f))
+
+
+# 🏗️ Answer history tables (run once during app startup)
+def init_quiz_tables():
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS quiz_answers (
+            id BIGSERIAL PRIMARY KEY,
+            user_id INTEGER REFERENCES users(id),
+            question_id VARCHAR(20),
+            is_correct BOOLEAN,
+            answered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_quiz_answers_user_answered
+        ON quiz_answers (user_id, answered_at)
+    """)
+    # Running totals per trainee and question, so sampling never scans quiz_answers
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS quiz_question_stats (
+            user_id INTEGER REFERENCES users(id),
+            question_id VARCHAR(20),
+            attempts INTEGER NOT NULL,
+            wrong INTEGER NOT NULL,
+            last_answered TIMESTAMP,
+            PRIMARY KEY (user_id, question_id)
+        )
+    """)
+    conn.commit()
+    cur.close()
+    conn.close()
+
+# 📈 {question_id: (attempts, wrong)} for one trainee
+def load_user_stats(user_id):
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT question_id, attempts, wrong FROM quiz_question_stats WHERE user_id = %s
+    """, (user_id,))
+    stats = {qid: (attempts, wrong) for qid, attempts, wrong in cur.fetchall()}
+    cur.close()
+    conn.close()
+    return stats
+
+# 💾 Write a batch of (question_id, is_correct) answers in one round trip per table
+def flush_answers(user_id, answers):
+    if not answers:
+        return
+    totals = defaultdict(lambda: [0, 0])
+    for qid, is_correct in answers:
+        totals[qid][0] += 1
+        totals[qid][1] += 0 if is_correct else 1
+
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        execute_values(cur, """
+            INSERT INTO quiz_answers (user_id, question_id, is_correct) VALUES %s
+        """, [(user_id, qid, is_correct) for qid, is_correct in answers])
+        execute_values(cur, """
+            INSERT INTO quiz_question_stats AS s (user_id, question_id, attempts, wrong, last_answered)
+            VALUES %s
+            ON CONFLICT (user_id, question_id) DO UPDATE SET
+                attempts = s.attempts + EXCLUDED.attempts,
+                wrong = s.wrong + EXCLUDED.wrong,
+                last_answered = EXCLUDED.last_answered
+        """, [(user_id, qid, attempts, wrong) for qid, (attempts, wrong) in totals.items()],
+            template="(%s, %s, %s, %s, CURRENT_TIMESTAMP)")
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+
+def _question_weight(stats, qid):
+    seen = stats.get(qid)
+    if seen is None:
+        return UNSEEN_WEIGHT
+    attempts, wrong = seen
+    # Smoothed error rate: always-wrong questions approach 2.75, mastered ones 0.25
+    return 0.25 + 2.5 * (wrong + 1) / (attempts + 2)
+
+# 🎲 Weighted sample without replacement (Efraimidis–Spirakis): O(n log k)
+def sample_quiz(bank, stats, disease, topic=None, difficulty=None, k=QUIZ_LENGTH, rng=random):
+    ids = bank.question_ids(disease, topic, difficulty)
+    chosen = heapq.nlargest(k, ids, key=lambda qid: rng.random() ** (1.0 / _question_weight(stats, qid)))
+    return [bank.by_id[qid] for qid in chosen]